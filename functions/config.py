@@ -1,7 +1,6 @@
 """Configuration settings for the roast-me application."""
 
 import os
-from google.genai import types
 
 # API Configuration
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
@@ -12,15 +11,33 @@ TTS_MODEL = "gemini-2.5-flash-preview-tts"
 TTS_VOICE = "Aoede"  # Energetic voice for roasting
 
 # Image Processing
-MAX_IMAGE_DIMENSION = 1024
+MAX_IMAGE_DIMENSION = 768  # Gemini tiles vision input at 768px; larger only costs more tokens
+JPEG_QUALITY = 85  # Visually equivalent to PNG for photos at a fraction of the bytes
+MAX_BATCH_SIZE = 4  # Images per batched Gemini call; keeps within per-image token budget
+# Upload cap checked before any base64 decode or PIL work. 15MB of
+# base64 is ~11MB of image - far above any legitimate phone photo - so
+# bigger payloads are rejected without spending CPU or RAM on them.
+MAX_IMAGE_B64_LENGTH = 15 * 1024 * 1024
 
 # Model Parameters
 ROAST_TEMPERATURE = 0.8
-ROAST_MAX_TOKENS = 2000  # Increased to prevent truncation
+# Realistic completions (12 short lines + tags + one-liner) land at
+# 400-600 tokens; keep some headroom but don't overprovision, since a
+# larger cap adds latency and cost. roast_service logs a warning on
+# MAX_TOKENS truncation so this can be tuned if the schema grows.
+ROAST_MAX_TOKENS = 600
+
+# Context budgeting for the dynamic output cap: the prompt is counted
+# once via count_tokens, images are charged per 768px tile.
+VISION_CONTEXT_WINDOW = 1_048_576
+IMAGE_TILE_SIZE = 768
+IMAGE_TOKENS_PER_TILE = 258
+CONTEXT_SAFETY_MARGIN = 256
 
 # TTS Configuration
 TTS_SAMPLE_RATE = 24000
 TTS_AUDIO_MIME_TYPE = "audio/L16;codec=pcm;rate=24000"
+TTS_TIMEOUT_SECONDS = 60  # Upper bound when waiting on backgrounded TTS synthesis
 
 # Testing
 ENABLE_AUDIO_TEST = os.environ.get("ENABLE_AUDIO_TEST") == "true"
@@ -32,74 +49,95 @@ CORS_HEADERS = {
     "Access-Control-Allow-Methods": "POST, OPTIONS",
 }
 
-# Roast Schema
-ROAST_SCHEMA = types.Schema(
-    type=types.Type.OBJECT,
-    properties={
-        "overall_vibe": types.Schema(
-            type=types.Type.STRING,
-            description="Overall impression or vibe of the person/image",
-        ),
-        "roast_lines": types.Schema(
-            type=types.Type.ARRAY,
-            items=types.Schema(type=types.Type.STRING),
-            description="8-12 individual roast jokes or observations - make them diverse and punchy",
-            min_items=8,
-        ),
-        "confidence_rating": types.Schema(
-            type=types.Type.INTEGER,
-            description="Perceived confidence level from 0 to 10",
-        ),
-        "style_tags": types.Schema(
-            type=types.Type.ARRAY,
-            items=types.Schema(type=types.Type.STRING),
-            description="Tone/style tags such as 'awkward', 'bold', 'chaotic'",
+# Gemini objects (schema + generation configs) are built lazily: importing
+# google.genai.types drags in the whole SDK (plus PIL), which would put it
+# back on the cold path for every module that imports config. PEP 562
+# module __getattr__ builds them on first access and caches in globals().
+def _build_gemini_objects():
+    from google.genai import types
+
+    # Roast Schema
+    roast_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "overall_vibe": types.Schema(
+                type=types.Type.STRING,
+                description="Overall impression or vibe of the person/image",
+            ),
+            "roast_lines": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="8-12 individual roast jokes or observations - make them diverse and punchy",
+                min_items=8,
+            ),
+            "confidence_rating": types.Schema(
+                type=types.Type.INTEGER,
+                description="Perceived confidence level from 0 to 10",
+            ),
+            "style_tags": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="Tone/style tags such as 'awkward', 'bold', 'chaotic'",
+            ),
+            "one_liner": types.Schema(
+                type=types.Type.STRING,
+                description="Best single-line roast",
+            ),
+        },
+        required=[
+            "overall_vibe",
+            "roast_lines",
+            "confidence_rating",
+            "style_tags",
+            "one_liner",
+        ],
+    )
+
+    # Prebuilt generation configs. GenerateContentConfig is a pydantic
+    # model, so constructing it per request re-validates every field;
+    # build once on first access and reuse.
+    return {
+        "ROAST_SCHEMA": roast_schema,
+        # Static prompt pre-wrapped as a Part so the SDK doesn't rebuild
+        # the pydantic text Part on every request.
+        "ROAST_PROMPT_PART": types.Part.from_text(text=ROAST_PROMPT),
+        "ROAST_GENERATION_CONFIG": types.GenerateContentConfig(
+            temperature=ROAST_TEMPERATURE,
+            max_output_tokens=ROAST_MAX_TOKENS,
+            response_schema=roast_schema,
+            response_mime_type="application/json",
         ),
-        "one_liner": types.Schema(
-            type=types.Type.STRING,
-            description="Best single-line roast",
+        "ROAST_FALLBACK_GENERATION_CONFIG": types.GenerateContentConfig(
+            temperature=ROAST_TEMPERATURE,
+            max_output_tokens=ROAST_MAX_TOKENS,
         ),
-    },
-    required=[
-        "overall_vibe",
-        "roast_lines",
-        "confidence_rating",
-        "style_tags",
-        "one_liner",
-    ],
+    }
+
+
+_LAZY_GEMINI_ATTRS = (
+    "ROAST_SCHEMA",
+    "ROAST_PROMPT_PART",
+    "ROAST_GENERATION_CONFIG",
+    "ROAST_FALLBACK_GENERATION_CONFIG",
 )
 
+
+def __getattr__(name):
+    if name in _LAZY_GEMINI_ATTRS:
+        globals().update(_build_gemini_objects())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 # Roast Prompt
-ROAST_PROMPT = """
-You are a roast comedian speaking directly to the person in front of you.
-
-Style & Delivery:
-- Sound like natural spoken language, not written text
-- Short punchy sentences that flow when spoken aloud
-- Confident, relaxed rhythm
-- Playful roasting, never hateful
-- Clever observations, not insults
-- Use conversational phrasing and timing
-- Let jokes breathe — pauses matter
-
-Language Rules:
-- Use contractions (you're, ain't, that's, can't)
-- Light slang is allowed, but don't overdo it
-- Occasional emphasis like "nah", "see", "look", "hold up"
-- Repetition is okay if it adds rhythm
-- Write exactly how it should be spoken
-
-Roast Rules:
-- Roast actions, vibes, or presentation — not identity
-- Keep it funny, not aggressive
-- Sound like a comedian enjoying the moment
-- Focus on what you SEE in the image
-
-Output Requirements:
-- Output must strictly follow the provided JSON schema
-- No extra text, no markdown, no explanations
-- Provide 8-12 roast_lines - make them diverse and varied
-- Write roast_lines as if you're speaking directly to them
-- Use ellipses (...) in text for dramatic pauses
+# Kept deliberately terse: every token here is billed on every request,
+# and the schema already encodes the structural rules (e.g. min roast_lines).
+ROAST_PROMPT = """You're a roast comedian talking straight to the person in the image.
+- Natural spoken language: short punchy sentences, confident rhythm
+- Use contractions; light slang ok; "nah", "see", "look" for emphasis
+- Ellipses (...) mark dramatic pauses
+- Playful, never hateful; clever observations, not insults
+- Roast actions, vibes, presentation - never identity
+- Roast only what you SEE in the image
+- Make roast_lines diverse, spoken directly to them
 - Make the one_liner punchy and memorable
-"""
+- Output only JSON matching the schema - no markdown, no extra text"""
@@ -3,52 +3,233 @@ Roast-Me Cloud Function
 Analyzes images and generates playful roasts with TTS audio.
 """
 
-import functions_framework
-from flask import jsonify
-from google import genai
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import functions_framework
+import orjson
+from flask import Response
 
-from config import GEMINI_API_KEY, CORS_HEADERS
-from utils.image_utils import parse_image_from_request, resize_image, image_to_bytes
-from services.roast_service import generate_roast, build_narration_text
-from services.tts_service import generate_tts_audio, get_audio_mime_type
-from services.animation_service import generate_animation_script
+from config import GEMINI_API_KEY, CORS_HEADERS, TTS_TIMEOUT_SECONDS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Gemini client
-if not GEMINI_API_KEY:
+# Captured once at import: the key can't change without a redeploy, so
+# per-request os.environ lookups would be dead weight.
+_API_KEY_CONFIGURED = bool(GEMINI_API_KEY)
+
+if not _API_KEY_CONFIGURED:
     logger.warning("GEMINI_API_KEY not set")
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+
+def _get_client():
+    """
+    Return the shared Gemini client.
+
+    Importing google.genai is a large chunk of cold-start time, and
+    OPTIONS preflights never need it - the singleton in
+    services.gemini_client defers that import until the first real POST.
+    """
+    from services.gemini_client import get_client
+
+    return get_client()
+
+
+# One persistent event loop on a daemon thread: asyncio.run would build
+# and tear down a loop (plus the SDK's async connections) per request,
+# and the services' shared concurrency semaphores must live on a single
+# loop for their whole lifetime.
+_event_loop = asyncio.new_event_loop()
+threading.Thread(target=_event_loop.run_forever, name="asyncio-loop", daemon=True).start()
+
+
+def _run_async(coro):
+    """Run a coroutine on the persistent loop and block for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop).result()
+
+
+def _warm_up_client():
+    """Pre-establish the TLS/HTTP connection to the Gemini endpoint."""
+    try:
+        _get_client().models.list()
+        logger.info("Gemini client warmed up")
+    except Exception as warmup_error:
+        logger.warning(f"Gemini warmup failed: {warmup_error}")
+
+
+# Fire-and-forget warmup on a daemon thread: the first request per
+# container otherwise pays ~100-300ms of TLS + HTTP handshake to
+# generativelanguage.googleapis.com. Import itself isn't blocked, and
+# the SDK keeps the warmed httpx connection pool alive for reuse.
+if _API_KEY_CONFIGURED:
+    threading.Thread(target=_warm_up_client, name="gemini-warmup", daemon=True).start()
+
+
+# Shared executor so TTS synthesis can overlap with the animation call
+# instead of running strictly serially (TTS dominates request latency).
+executor = ThreadPoolExecutor(max_workers=4)
+
+
+async def _roast_pipeline(client, image_bytes, image_size):
+    """
+    Run roast -> narration -> (TTS || animation) for one image.
+
+    The roast and animation services are async (client.aio), so awaiting
+    them here lets concurrent work overlap instead of serializing the
+    Gemini round-trips.
+
+    Args:
+        client: Gemini client instance
+        image_bytes: JPEG bytes to roast
+        image_size: Optional (width, height) for token budgeting
+
+    Returns:
+        tuple: (roast_data, animation_script, audio_base64)
+    """
+    from services.roast_service import generate_roast, build_narration_text
+    from services.tts_service import generate_tts_audio
+    from services.animation_service import generate_animation_script
+
+    roast_data = await generate_roast(client, image_bytes, image_size=image_size)
+
+    # Build narration text for TTS
+    narration_text = build_narration_text(roast_data)
+
+    # TTS uses the synchronous SDK surface, so it runs on the executor;
+    # the animation call below proceeds while the audio is synthesized.
+    tts_task = asyncio.get_running_loop().run_in_executor(
+        executor, generate_tts_audio, client, narration_text
+    )
+
+    # Estimate audio duration (rough estimate: ~150 words per minute = 0.4 seconds per word)
+    word_count = len(narration_text.split())
+    estimated_duration = max(3, word_count * 0.4)  # Minimum 3 seconds
+
+    async def _animation():
+        # Animation failures degrade to no script rather than failing
+        # the whole request.
+        try:
+            return await generate_animation_script(
+                client,
+                narration_text,
+                estimated_duration
+            )
+        except Exception as anim_error:
+            logger.warning(f"Animation script generation failed, continuing without: {anim_error}")
+            return None
+
+    # Gather both legs here instead of collecting the TTS future back on
+    # the Flask thread: the response is ready the moment the slower leg
+    # finishes, with no extra cross-thread handoff in between.
+    animation_script, audio_base64 = await asyncio.gather(
+        _animation(),
+        asyncio.wait_for(tts_task, timeout=TTS_TIMEOUT_SECONDS),
+    )
+
+    return roast_data, animation_script, audio_base64
+
+
+# Pooled encode buffers: reusing a BytesIO avoids several MB of
+# transient allocation (and the resulting GC churn) per image encode.
+# Thread-local rather than a single shared buffer because encodes run on
+# both the Flask thread and executor workers, and gen2 concurrency can
+# interleave requests - two writers on one buffer would silently corrupt
+# the JPEG bytes sent to Gemini.
+_encode_buffers = threading.local()
+
+
+def _encode_buffer():
+    """Return this thread's pooled encode buffer, creating it lazily."""
+    buffer = getattr(_encode_buffers, "buffer", None)
+    if buffer is None:
+        buffer = _encode_buffers.buffer = BytesIO()
+    return buffer
+
+
+# Static responses built once - their bodies never change, so there's no
+# reason to run jsonify's serialization machinery per request.
+_PREFLIGHT_RESPONSE = ("", 204, CORS_HEADERS)
+_API_KEY_MISSING_RESPONSE = Response(
+    b'{"success":false,"error":"GEMINI_API_KEY not configured"}',
+    status=500,
+    mimetype="application/json",
+    headers=CORS_HEADERS,
+)
+
+
+def _json_response(data, status_code=200):
+    """
+    Serialize a response body with orjson.
+
+    orjson is several times faster than the stdlib json that jsonify
+    uses, which matters when the body carries a few hundred KB of
+    base64 audio.
+
+    Args:
+        data: JSON-serializable response body
+        status_code: HTTP status code
+
+    Returns:
+        Flask Response
+    """
+    return Response(
+        orjson.dumps(data),
+        status=status_code,
+        mimetype="application/json",
+        headers=CORS_HEADERS,
+    )
 
 
 @functions_framework.http
 def roast_image(request):
     """
     HTTP Cloud Function to generate roasts from images.
-    
+
     Args:
         request: Flask request object
-        
+
     Returns:
         JSON response with roast data and optional audio
     """
     # Handle CORS preflight
     if request.method == "OPTIONS":
-        return ("", 204, CORS_HEADERS)
+        return _PREFLIGHT_RESPONSE
+
+    # Deferred imports: PIL and google.genai are only pulled in once a
+    # real request arrives, keeping module import (and preflights) fast.
+    from utils.image_utils import (
+        parse_image_from_request,
+        parse_images_from_request,
+        resize_image,
+        image_to_bytes,
+    )
+    from services.roast_service import generate_roast_batch
+    from services.tts_service import get_audio_mime_type
 
     try:
         logger.info("Roast request received")
 
         # Validate API key
-        if not GEMINI_API_KEY:
-            return _error_response(
-                "GEMINI_API_KEY not configured",
-                status_code=500
-            )
+        if not _API_KEY_CONFIGURED:
+            return _API_KEY_MISSING_RESPONSE
+
+        # Batch path: several images packed into one Gemini call so the
+        # fixed prompt tokens are paid once. Roast data only, no TTS.
+        batch = parse_images_from_request(request)
+        if batch is not None:
+            client = _get_client()
+            batch_bytes = [
+                item if isinstance(item, bytes)
+                else image_to_bytes(resize_image(item), buffer=_encode_buffer())
+                for item in batch
+            ]
+            roasts = _run_async(generate_roast_batch(client, batch_bytes))
+            return _json_response({"success": True, "data": roasts})
 
         # Parse and validate image
         image = parse_image_from_request(request)
@@ -58,33 +239,30 @@ def roast_image(request):
                 status_code=400
             )
 
-        # Process image
-        image = resize_image(image)
-        image_bytes = image_to_bytes(image)
-
-        # Generate roast
-        roast_data = generate_roast(client, image_bytes)
-
-        # Build narration text for TTS
-        narration_text = build_narration_text(roast_data)
+        # Process image. Raw bytes mean the upload was already within
+        # the size cap, so the decode/resize/re-encode is skipped.
+        if isinstance(image, bytes):
+            image_bytes = image
+            image_size = None
+            client = _get_client()
+        else:
+            # Resize + encode on the executor so the CPU work overlaps
+            # client construction on a cold container (PIL releases the
+            # GIL inside its C resize loops). On warm containers the
+            # client fetch is a dict lookup and the result is collected
+            # immediately.
+            def _resize_and_encode():
+                resized = resize_image(image)
+                return image_to_bytes(resized, buffer=_encode_buffer()), resized.size
 
-        # Generate TTS audio
-        audio_base64 = generate_tts_audio(client, narration_text)
+            encode_future = executor.submit(_resize_and_encode)
+            client = _get_client()
+            image_bytes, image_size = encode_future.result()
 
-        # Estimate audio duration (rough estimate: ~150 words per minute = 0.4 seconds per word)
-        word_count = len(narration_text.split())
-        estimated_duration = max(3, word_count * 0.4)  # Minimum 3 seconds
-
-        # Generate animation script based on narration and estimated duration
-        try:
-            animation_script = generate_animation_script(
-                client, 
-                narration_text, 
-                estimated_duration
-            )
-        except Exception as anim_error:
-            logger.warning(f"Animation script generation failed, continuing without: {anim_error}")
-            animation_script = None
+        # Roast, TTS and animation (TTS overlaps with the animation call)
+        roast_data, animation_script, audio_base64 = _run_async(
+            _roast_pipeline(client, image_bytes, image_size)
+        )
 
         # Build response
         response_data = {
@@ -99,7 +277,7 @@ def roast_image(request):
         if animation_script:
             response_data["animationScript"] = animation_script
 
-        return jsonify(response_data), 200, CORS_HEADERS
+        return _json_response(response_data)
 
     except ValueError as ve:
         # Expected errors (validation, safety filters, etc.)
@@ -118,15 +296,12 @@ def roast_image(request):
 def _error_response(message, status_code=500):
     """
     Create a standardized error response.
-    
+
     Args:
         message: Error message
         status_code: HTTP status code
-        
+
     Returns:
-        Flask response tuple
+        Flask Response
     """
-    return jsonify({
-        "success": False,
-        "error": message,
-    }), status_code, CORS_HEADERS
\ No newline at end of file
+    return _json_response({"success": False, "error": message}, status_code)
@@ -2,62 +2,68 @@
 Animation Constants
 Centralized configuration for available animations and expressions.
 Matches the frontend component capabilities in composables/.
+
+Everything here is read-only at runtime: the dicts are wrapped in
+MappingProxyType and the inner lists are tuples, so nothing downstream
+needs a defensive copy and CPython can intern the keys once.
 """
 
+from types import MappingProxyType
+
 # ============================================
 # AVAILABLE ANIMATIONS
 # Maps animation names to descriptions matching frontend ANIMATION_STATES
 # ============================================
-AVAILABLE_ANIMATIONS = {
+AVAILABLE_ANIMATIONS = MappingProxyType({
     "idle": {
         "name": "idle",
         "description": "Standing idle - neutral pose",
         "energy": "low",
-        "use_cases": ["neutral moments", "listening", "thinking"]
+        "use_cases": ("neutral moments", "listening", "thinking")
     },
     "walkRelaxed": {
         "name": "walkRelaxed",
         "description": "Casual walking - relaxed movement",
         "energy": "low",
-        "use_cases": ["transitions", "casual storytelling"]
+        "use_cases": ("transitions", "casual storytelling")
     },
     "walkThink": {
         "name": "walkThink",
         "description": "Walking while thinking - contemplative",
         "energy": "medium",
-        "use_cases": ["building up", "pacing", "considering"]
+        "use_cases": ("building up", "pacing", "considering")
     },
     "run": {
         "name": "run",
         "description": "Running/energetic movement - high energy",
         "energy": "high",
-        "use_cases": ["excitement", "climax", "punchlines"]
+        "use_cases": ("excitement", "climax", "punchlines")
     },
     "sitTalk": {
         "name": "sitTalk",
         "description": "Sitting and talking - conversational",
         "energy": "medium",
-        "use_cases": ["casual delivery", "storytelling", "relaxed tone"]
+        "use_cases": ("casual delivery", "storytelling", "relaxed tone")
     },
     "spellcast": {
         "name": "spellcast",
         "description": "Spellcast gesture - dramatic hand movement",
         "energy": "high",
-        "use_cases": ["emphasis", "dramatic moments", "punchlines"]
+        "use_cases": ("emphasis", "dramatic moments", "punchlines")
     },
     "relax": {
         "name": "relax",
         "description": "Relaxing pose - comfortable stance",
         "energy": "low",
-        "use_cases": ["conclusion", "settling down", "comfortable moments"]
+        "use_cases": ("conclusion", "settling down", "comfortable moments")
     }
-}
+})
 
 # ============================================
 # AVAILABLE EXPRESSIONS
 # Maps expression names to descriptions matching frontend EXPRESSIONS
 # ============================================
-AVAILABLE_EXPRESSIONS = {
+AVAILABLE_EXPRESSIONS = MappingProxyType({
     "neutral": {
         "name": "neutral",
         "description": "Default neutral face",
@@ -94,20 +100,20 @@ AVAILABLE_EXPRESSIONS = {
         "emotion": "uncertain",
         "intensity": 0.5
     }
-}
+})
 
 # ============================================
 # ANIMATION CONFIGURATION
 # General settings for animation generation
 # ============================================
-ANIMATION_CONFIG = {
+ANIMATION_CONFIG = MappingProxyType({
     "min_duration": 3,  # Minimum animation duration in seconds
     "max_keyframes": 10,  # Maximum number of keyframes in timeline
     "default_intensity": 0.5,  # Default movement intensity
     "intensity_range": (0.0, 1.0),  # Valid intensity range
     "temperature": 0.7,  # Creativity level for Gemini (0-1)
     "max_tokens": 2000  # Max tokens for generation response
-}
+})
 
 # ============================================
 # DEFAULTS
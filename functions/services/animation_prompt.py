@@ -1,63 +1,67 @@
 """
 Animation Prompt Templates
 Manages prompt generation for Gemini animation script creation.
+
+The prompt is split into a static prefix (task description, available
+animations/expressions, response format, requirements) and a small
+dynamic tail carrying only the transcript and duration. The prefix never
+changes between calls, so the service can register it once as Gemini
+cached content and pay its prompt tokens a single time.
 """
 
 from .animation_constants import AVAILABLE_ANIMATIONS, AVAILABLE_EXPRESSIONS
 
+# The animation/expression catalogs never mutate at runtime, so their
+# prompt-ready listings are formatted once at import instead of being
+# rebuilt (iteration + join + allocations) on every prompt.
+_ANIMATIONS_STR = "\n".join(
+    f"- {key}: {entry['description']}"
+    for key, entry in AVAILABLE_ANIMATIONS.items()
+)
+_EXPRESSIONS_STR = "\n".join(
+    f"- {key}: {entry['description']}"
+    for key, entry in AVAILABLE_EXPRESSIONS.items()
+)
+
 
 def format_available_animations():
     """
     Format available animations for prompt inclusion.
-    
+
     Returns:
-        str: Formatted animation options
+        str: Formatted animation options (precomputed at import)
     """
-    return "\n".join([
-        f"- {key}: {config['description']}"
-        for key, config in AVAILABLE_ANIMATIONS.items()
-    ])
+    return _ANIMATIONS_STR
 
 
 def format_available_expressions():
     """
     Format available expressions for prompt inclusion.
-    
+
     Returns:
-        str: Formatted expression options
+        str: Formatted expression options (precomputed at import)
     """
-    return "\n".join([
-        f"- {key}: {config['description']}"
-        for key, config in AVAILABLE_EXPRESSIONS.items()
-    ])
+    return _EXPRESSIONS_STR
 
 
-def build_animation_generation_prompt(transcript, duration):
+def _build_static_prefix():
     """
-    Build the full prompt for animation script generation.
-    
-    Args:
-        transcript (str): The narration/speech text
-        duration (float): Duration of audio in seconds
-        
+    Build the fixed portion of the animation prompt.
+
+    Everything here is independent of the transcript, so it is computed
+    once at import and reused (directly or via a Gemini content cache).
+
     Returns:
-        str: Complete prompt for Gemini
+        str: Static prompt prefix
     """
-    animations_str = format_available_animations()
-    expressions_str = format_available_expressions()
-    
-    prompt = f"""You are an expert animation director for 3D character comedy performance.
-Analyze the following transcript and generate a detailed animation script that brings the performance to life.
-
-TRANSCRIPT DURATION: {duration} seconds
-TRANSCRIPT TEXT:
-{transcript}
+    return f"""You are an expert animation director for 3D character comedy performance.
+Analyze the transcript given at the end of this prompt and generate a detailed animation script that brings the performance to life.
 
 AVAILABLE BODY ANIMATIONS:
-{animations_str}
+{_ANIMATIONS_STR}
 
 AVAILABLE FACIAL EXPRESSIONS:
-{expressions_str}
+{_EXPRESSIONS_STR}
 
 YOUR TASK:
 Generate a JSON animation script with precise timing and movement choices that:
@@ -90,7 +94,7 @@ Return ONLY valid JSON (no markdown, no extra text). Structure:
 }}
 
 REQUIREMENTS:
-- Timeline must span 0 to {duration} seconds
+- Timeline must span 0 to the full transcript duration in seconds
 - Minimum 3 keyframes, maximum 10
 - All animation names must be from the AVAILABLE list
 - All expression names must be from the AVAILABLE list
@@ -98,5 +102,40 @@ REQUIREMENTS:
 - Smooth transitions between keyframes
 - Include at least 3 different animations
 - Vary expressions to match emotional content"""
-    
-    return prompt
+
+
+# Built once at import; the service registers this as cached content.
+STATIC_PREFIX = _build_static_prefix()
+
+
+def build_dynamic_tail(transcript, duration):
+    """
+    Build the per-request portion of the animation prompt.
+
+    Args:
+        transcript (str): The narration/speech text
+        duration (float): Duration of audio in seconds
+
+    Returns:
+        str: Dynamic prompt tail (transcript + duration only)
+    """
+    return f"""TRANSCRIPT DURATION: {duration} seconds
+TRANSCRIPT TEXT:
+{transcript}"""
+
+
+def build_animation_generation_prompt(transcript, duration):
+    """
+    Build the full prompt for animation script generation.
+
+    Used when no Gemini content cache is available; otherwise the service
+    sends only the dynamic tail and references the cached prefix.
+
+    Args:
+        transcript (str): The narration/speech text
+        duration (float): Duration of audio in seconds
+
+    Returns:
+        str: Complete prompt for Gemini
+    """
+    return f"{STATIC_PREFIX}\n\n{build_dynamic_tail(transcript, duration)}"
@@ -4,32 +4,182 @@ Orchestrates Gemini API calls to generate animation scripts from narration.
 Uses component modules for constants, prompts, validation, and utilities.
 """
 
+import asyncio
+import functools
 import logging
-import sys
 import os
+
+import cachetools
 from google import genai
 from google.genai import types
-
-# Ensure parent directory is in path for config import
-if __name__ != "__main__":
-    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    if parent_dir not in sys.path:
-        sys.path.insert(0, parent_dir)
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 import config
-from .animation_constants import ANIMATION_CONFIG
-from .animation_prompt import build_animation_generation_prompt
-from .animation_validator import validate_animation_script, log_validation_issues
+from .gemini_client import get_client
+from .animation_constants import (
+    ANIMATION_CONFIG,
+    AVAILABLE_ANIMATIONS,
+    AVAILABLE_EXPRESSIONS,
+)
+from .animation_prompt import (
+    STATIC_PREFIX,
+    build_animation_generation_prompt,
+    build_dynamic_tail,
+)
+from .animation_validator import validate_and_sanitize, log_validation_issues
 from .animation_utils import (
     parse_animation_response,
-    generate_default_animation_script,
-    sanitize_animation_script
+    generate_default_animation_script
 )
 
 logger = logging.getLogger(__name__)
 
+# Bound concurrent Gemini calls; see roast_service for rationale.
+_GEMINI_SEM = asyncio.Semaphore(int(os.environ.get("GEMINI_CONCURRENCY", "6")))
+
+# Exact-match script cache: the same narration at the same duration
+# always earns the same (validated) script, so repeat requests skip the
+# Gemini round-trip. Duration is rounded to 0.1s so float noise from the
+# word-count estimate doesn't defeat the cache.
+_ANIMATION_CACHE = cachetools.LRUCache(maxsize=256)
+
+
+def _is_retryable_api_error(exc):
+    """Retry only rate limits (429) and server-side errors (5xx)."""
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code == 429 or (isinstance(code, int) and code >= 500)
+
+
+@retry(
+    retry=retry_if_exception(_is_retryable_api_error),
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    reraise=True,
+)
+async def _generate_content(client, **kwargs):
+    """generate_content gated by the concurrency semaphore, with backoff."""
+    async with _GEMINI_SEM:
+        return await client.aio.models.generate_content(**kwargs)
+
+
+@functools.lru_cache(maxsize=1)
+def _animation_schema():
+    """
+    Structured-output schema mirroring the prompt's RESPONSE FORMAT.
+
+    With response_schema set, Gemini enforces the shape (and the
+    animation/expression enums and intensity range) server-side, so the
+    Python validation pass is unnecessary whenever response.parsed comes
+    back. Built lazily like the roast schema in config.
+    """
+    keyframe_schema = types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "startTime": types.Schema(type=types.Type.NUMBER),
+            "endTime": types.Schema(type=types.Type.NUMBER),
+            "animation": types.Schema(
+                type=types.Type.STRING, enum=list(AVAILABLE_ANIMATIONS)
+            ),
+            "expression": types.Schema(
+                type=types.Type.STRING, enum=list(AVAILABLE_EXPRESSIONS)
+            ),
+            "intensity": types.Schema(
+                type=types.Type.NUMBER, minimum=0.0, maximum=1.0
+            ),
+            "notes": types.Schema(type=types.Type.STRING),
+        },
+        required=["startTime", "endTime", "animation", "expression", "intensity"],
+    )
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "metadata": types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "duration": types.Schema(type=types.Type.NUMBER),
+                    "transcript": types.Schema(type=types.Type.STRING),
+                    "intensity": types.Schema(
+                        type=types.Type.STRING, enum=["low", "medium", "high"]
+                    ),
+                    "style": types.Schema(type=types.Type.STRING),
+                    "notes": types.Schema(type=types.Type.STRING),
+                },
+                required=["duration"],
+            ),
+            "timeline": types.Schema(
+                type=types.Type.ARRAY,
+                items=keyframe_schema,
+                min_items=3,
+                max_items=ANIMATION_CONFIG["max_keyframes"],
+            ),
+        },
+        required=["metadata", "timeline"],
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _batch_animation_config(batch_size):
+    """Generation config requiring exactly batch_size scripts in an array."""
+    batch_schema = types.Schema(
+        type=types.Type.ARRAY,
+        items=_animation_schema(),
+        description="One animation script per transcript, in input order",
+        min_items=batch_size,
+        max_items=batch_size,
+    )
+    return types.GenerateContentConfig(
+        temperature=ANIMATION_CONFIG["temperature"],
+        max_output_tokens=ANIMATION_CONFIG["max_tokens"] * batch_size,
+        response_schema=batch_schema,
+        response_mime_type="application/json",
+    )
+
+
+# Name of the Gemini content cache holding the static prompt prefix.
+# None = not yet attempted, False = unavailable (send the full prompt).
+_cached_prefix_name = None
+
 
-def generate_animation_script(client, transcript, duration_seconds):
+async def _get_cached_prefix(client):
+    """
+    Register the static prompt prefix as Gemini cached content, once.
+
+    The prefix (task description, animation/expression lists, response
+    format) is identical for every call, so caching it server-side means
+    its prompt tokens are billed and prefilled a single time per TTL
+    window. Falls back cleanly when the API rejects the cache (e.g. the
+    prefix is below the model's minimum cacheable token count).
+
+    Args:
+        client: Gemini client instance
+
+    Returns:
+        str or None: Cache resource name, or None when caching is unavailable
+    """
+    global _cached_prefix_name
+    if _cached_prefix_name is None:
+        try:
+            cache = await client.aio.caches.create(
+                model=config.VISION_MODEL,
+                config=types.CreateCachedContentConfig(
+                    contents=[STATIC_PREFIX],
+                    ttl="3600s",
+                ),
+            )
+            _cached_prefix_name = cache.name
+            logger.info("Animation prompt prefix cached as %s", cache.name)
+        except Exception as cache_error:
+            logger.info("Context caching unavailable, sending full prompt: %s", cache_error)
+            _cached_prefix_name = False
+    return _cached_prefix_name or None
+
+
+async def generate_animation_script(client, transcript, duration_seconds):
     """
     Generate an animation script from audio transcript using Gemini.
     
@@ -40,92 +190,204 @@ def generate_animation_script(client, transcript, duration_seconds):
     4. Returns fallback script if generation fails
     
     Args:
-        client: Gemini client instance
+        client: Gemini client instance, or None for the shared singleton
         transcript (str): The narration text/transcript
         duration_seconds (float): Expected audio duration in seconds
-        
+
     Returns:
         dict: Animation script with timeline and metadata
-        
+
     Raises:
         ValueError: If animation generation fails completely
     """
-    logger.info(f"Generating animation script for {duration_seconds}s audio")
-    logger.info(f"Transcript length: {len(transcript)} characters")
-    
+    if client is None:
+        client = get_client()
+
+    cache_key = (transcript, round(duration_seconds, 1))
+    cached = _ANIMATION_CACHE.get(cache_key)
+    if cached is not None:
+        logger.info("Animation script served from in-process cache")
+        return cached
+
+    logger.info("Generating animation script for %ss audio", duration_seconds)
+    logger.info("Transcript length: %d characters", len(transcript))
+
     try:
-        # Step 1: Build prompt with available options
-        prompt = build_animation_generation_prompt(transcript, duration_seconds)
-        
-        # Step 2: Call Gemini API
-        animation_script = _call_gemini_for_animation(client, prompt)
-        
+        # Steps 1-2: Build prompt (cached prefix + dynamic tail) and call Gemini
+        animation_script, schema_backed = await _call_gemini_for_animation(
+            client, transcript, duration_seconds
+        )
+
         if animation_script is None:
             logger.warning("Gemini returned no animation script, using fallback")
             return generate_default_animation_script(duration_seconds, transcript)
-        
-        # Step 3: Validate script structure
-        is_valid, issues = validate_animation_script(animation_script, duration_seconds)
-        
-        if issues:
-            log_validation_issues(issues)
-            if not is_valid:
+
+        # Steps 3-4: Validate and sanitize, then cache. Schema-backed
+        # responses already had their shape, enums and intensity range
+        # enforced server-side, so the Python traversal is skipped for
+        # them. Fallback scripts are never cached so a transient failure
+        # doesn't pin a canned script.
+        if schema_backed:
+            sanitized = animation_script
+        else:
+            sanitized, issues = validate_and_sanitize(animation_script, duration_seconds)
+            if issues:
+                log_validation_issues(issues)
+            if sanitized is None:
                 logger.warning("Validation failed, using fallback script")
                 return generate_default_animation_script(duration_seconds, transcript)
-        
-        # Step 4: Sanitize and return
-        sanitized = sanitize_animation_script(animation_script)
-        logger.info(f"Animation script generated with {len(sanitized.get('timeline', []))} keyframes")
-        
+
+        logger.info("Animation script generated with %d keyframes", len(sanitized.get("timeline", [])))
+
+        _ANIMATION_CACHE[cache_key] = sanitized
         return sanitized
         
     except Exception as e:
-        logger.error(f"Animation script generation failed: {e}")
+        logger.error("Animation script generation failed: %s", e)
         logger.info("Falling back to default animation script")
         return generate_default_animation_script(duration_seconds, transcript)
 
 
-def _call_gemini_for_animation(client, prompt):
+async def generate_animation_scripts_batch(client, items):
+    """
+    Generate animation scripts for several transcripts in one Gemini call.
+
+    Batching ships the static instructions once for the whole set, so K
+    transcripts cost roughly one prompt plus K completions instead of K
+    full round-trips - the same amortization generate_roast_batch uses.
+
+    Args:
+        client: Gemini client instance, or None for the shared singleton
+        items: List of (transcript, duration_seconds) tuples
+
+    Returns:
+        list[dict]: One animation script per item, in input order
+
+    Raises:
+        ValueError: If items is empty
+    """
+    if client is None:
+        client = get_client()
+
+    if not items:
+        raise ValueError("No items provided for batch animation")
+
+    logger.info("Generating batch animation scripts for %d transcripts", len(items))
+
+    prompt_parts = [
+        STATIC_PREFIX,
+        "\n\nGenerate one animation script per transcript below and return"
+        " a JSON array containing the scripts in the same order.\n",
+    ]
+    for i, (transcript, duration_seconds) in enumerate(items, 1):
+        prompt_parts.append(f"\nITEM {i}:\n")
+        prompt_parts.append(build_dynamic_tail(transcript, duration_seconds))
+        prompt_parts.append("\n")
+
+    parsed = None
+    try:
+        response = await _generate_content(
+            client,
+            model=config.VISION_MODEL,
+            contents=["".join(prompt_parts)],
+            config=_batch_animation_config(len(items)),
+        )
+        if response.candidates:
+            parsed = response.parsed
+    except Exception as batch_error:
+        logger.error("Batch animation call failed: %s", batch_error)
+
+    if not isinstance(parsed, list):
+        parsed = []
+
+    # Schema-backed entries are used directly; anything missing or
+    # malformed is regenerated individually (which itself falls back to
+    # the default script on failure).
+    scripts = []
+    for i, (transcript, duration_seconds) in enumerate(items):
+        entry = parsed[i] if i < len(parsed) else None
+        if isinstance(entry, dict):
+            scripts.append(entry)
+        else:
+            logger.warning("Batch entry %d unusable, regenerating individually", i)
+            scripts.append(
+                await generate_animation_script(client, transcript, duration_seconds)
+            )
+    return scripts
+
+
+async def _call_gemini_for_animation(client, transcript, duration_seconds):
     """
     Call Gemini API to generate animation script.
-    
+
     Args:
         client: Gemini client instance
-        prompt (str): The prompt to send to Gemini
-        
+        transcript (str): The narration text/transcript
+        duration_seconds (float): Expected audio duration in seconds
+
     Returns:
-        dict: Parsed animation script or None if failed
+        tuple: (script: dict | None, schema_backed: bool). schema_backed
+        is True when the script came from response.parsed and its shape
+        was enforced server-side by the response schema.
     """
+    global _cached_prefix_name
     try:
         logger.info("Calling Gemini API for animation generation")
-        
-        response = client.models.generate_content(
-            model=config.VISION_MODEL,
-            contents=[prompt],
-            config=types.GenerateContentConfig(
+
+        cache_name = await _get_cached_prefix(client)
+        if cache_name:
+            # Static prefix lives server-side; only the tail travels.
+            contents = [build_dynamic_tail(transcript, duration_seconds)]
+            generation_config = types.GenerateContentConfig(
                 temperature=ANIMATION_CONFIG["temperature"],
                 max_output_tokens=ANIMATION_CONFIG["max_tokens"],
-            ),
+                cached_content=cache_name,
+                response_schema=_animation_schema(),
+                response_mime_type="application/json",
+            )
+        else:
+            contents = [build_animation_generation_prompt(transcript, duration_seconds)]
+            generation_config = types.GenerateContentConfig(
+                temperature=ANIMATION_CONFIG["temperature"],
+                max_output_tokens=ANIMATION_CONFIG["max_tokens"],
+                response_schema=_animation_schema(),
+                response_mime_type="application/json",
+            )
+
+        response = await _generate_content(
+            client,
+            model=config.VISION_MODEL,
+            contents=contents,
+            config=generation_config,
         )
-        
+
         # Check if response was blocked
         if not response.candidates:
             logger.error("Animation generation blocked by safety filters")
-            return None
-        
-        # Extract text response
+            return None, False
+
+        # Happy path: the SDK already decoded the schema-conforming JSON.
+        parsed = response.parsed
+        if isinstance(parsed, dict):
+            return parsed, True
+
+        # Fallback: extract and parse the text ourselves.
         response_text = response.candidates[0].content.parts[0].text
-        logger.debug(f"Gemini response (first 200 chars): {response_text[:200]}")
-        
-        # Parse JSON from response
+        # Guarded: even lazy %-formatting would still pay for the slice
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Gemini response (first 200 chars): %s", response_text[:200])
+
         parsed_script, parse_error = parse_animation_response(response_text)
         if parse_error:
-            logger.error(f"Failed to parse Gemini response: {parse_error}")
-            logger.debug(f"Full response: {response_text}")
-            return None
-        
-        return parsed_script
-        
+            logger.error("Failed to parse Gemini response: %s", parse_error)
+            logger.debug("Full response: %s", response_text)
+            return None, False
+
+        return parsed_script, False
+
     except Exception as e:
-        logger.error(f"Gemini API call failed: {e}")
-        return None
+        logger.error("Gemini API call failed: %s", e)
+        if _cached_prefix_name:
+            # The cache may have expired mid-TTL; recreate it next call.
+            _cached_prefix_name = None
+        return None, False
@@ -5,6 +5,9 @@ Helper functions for animation script generation and processing.
 
 import json
 import logging
+import re
+
+import orjson
 from .animation_constants import (
     AVAILABLE_ANIMATIONS, 
     AVAILABLE_EXPRESSIONS,
@@ -15,134 +18,141 @@ from .animation_constants import (
 
 logger = logging.getLogger(__name__)
 
+# Reusable decoder: raw_decode parses from an offset and stops at the end
+# of the first JSON value, so one pass replaces the old find + rfind +
+# slice + loads sequence (two extra scans and a full substring copy).
+_JSON_DECODER = json.JSONDecoder()
+
 
 def parse_animation_response(response_text):
     """
     Extract and parse JSON from Gemini response.
     Handles responses with surrounding text.
-    
+
     Args:
         response_text (str): Raw response text from Gemini
-        
+
     Returns:
         tuple: (parsed_dict: dict | None, error: str | None)
     """
     try:
-        # Try to find JSON block in response
+        # Fast path: the prompt demands bare JSON and the model usually
+        # complies, so most responses decode directly with orjson (2-5x
+        # faster than the stdlib on the multi-KB timeline arrays).
+        try:
+            return orjson.loads(response_text), None
+        except orjson.JSONDecodeError:
+            pass
+
+        # Slow path: surrounding prose or markdown fences present.
         json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
-        
-        if json_start < 0 or json_end <= json_start:
+        if json_start < 0:
             return None, "No JSON object found in response"
-        
-        json_str = response_text[json_start:json_end]
-        parsed = json.loads(json_str)
-        
+
+        parsed, _ = _JSON_DECODER.raw_decode(response_text, json_start)
         return parsed, None
-        
+
     except json.JSONDecodeError as e:
         return None, f"Invalid JSON: {str(e)}"
     except Exception as e:
         return None, f"Failed to parse response: {str(e)}"
 
 
+# Word counting without split(): matches run in C and nothing allocates
+# a list of per-word strings just to be counted.
+_WORD_RE = re.compile(r"\S+")
+
+
 def estimate_audio_duration(text):
     """
     Estimate audio duration from text.
     Based on average speaking rate of ~150 words per minute.
-    
+
     Args:
         text (str): The narration text
-        
+
     Returns:
         float: Estimated duration in seconds
     """
-    word_count = len(text.split())
+    word_count = sum(1 for _ in _WORD_RE.finditer(text))
     # 150 words per minute = 0.4 seconds per word
     estimated_seconds = word_count * 0.4
     # Minimum 3 seconds, maximum 120 seconds
     return max(3, min(120, estimated_seconds))
 
 
+# 4-section fallback pattern as (start_frac, end_frac, animation,
+# expression, intensity, notes). Fallbacks fire on every error path, so
+# the fixed parts live here instead of being re-allocated per call.
+_FALLBACK_TEMPLATE = (
+    (0.0, 0.25, "idle", "neutral", 0.5, "Opening - neutral stance, setting up"),
+    (0.25, 0.5, "sitTalk", "smile", 0.7, "Building - friendly, conversational tone"),
+    (0.5, 0.75, "spellcast", "laugh", 0.9, "Climax - high energy, emphasizing humor"),
+    (0.75, 1.0, "relax", "smile", 0.6, "Closing - settling down, satisfied expression"),
+)
+
+# Static metadata fields shared by every fallback script.
+_FALLBACK_METADATA = {
+    "intensity": "medium",
+    "style": "comedic",
+    "notes": "Generated using fallback pattern",
+    "fallback": True,
+}
+
+
 def generate_default_animation_script(duration_seconds, transcript):
     """
     Generate a simple fallback animation script when Gemini fails.
     Creates a 4-section animation pattern with good default values.
-    
+
     Args:
         duration_seconds (float): Duration of audio
         transcript (str): The narration text
-        
+
     Returns:
         dict: A valid animation script with fallback flag
     """
     logger.info("Generating default animation script fallback")
-    
-    # Divide duration into 4 sections
-    section_1 = duration_seconds * 0.25
-    section_2 = duration_seconds * 0.5
-    section_3 = duration_seconds * 0.75
-    
+
     timeline = [
         {
-            "startTime": 0,
-            "endTime": section_1,
-            "animation": "idle",
-            "expression": "neutral",
-            "intensity": 0.5,
-            "notes": "Opening - neutral stance, setting up"
-        },
-        {
-            "startTime": section_1,
-            "endTime": section_2,
-            "animation": "sitTalk",
-            "expression": "smile",
-            "intensity": 0.7,
-            "notes": "Building - friendly, conversational tone"
-        },
-        {
-            "startTime": section_2,
-            "endTime": section_3,
-            "animation": "spellcast",
-            "expression": "laugh",
-            "intensity": 0.9,
-            "notes": "Climax - high energy, emphasizing humor"
-        },
-        {
-            "startTime": section_3,
-            "endTime": duration_seconds,
-            "animation": "relax",
-            "expression": "smile",
-            "intensity": 0.6,
-            "notes": "Closing - settling down, satisfied expression"
+            "startTime": start_frac * duration_seconds,
+            "endTime": end_frac * duration_seconds,
+            "animation": animation,
+            "expression": expression,
+            "intensity": intensity,
+            "notes": notes
         }
+        for start_frac, end_frac, animation, expression, intensity, notes
+        in _FALLBACK_TEMPLATE
     ]
-    
+
     return {
         "metadata": {
+            **_FALLBACK_METADATA,
             "duration": duration_seconds,
             "transcript": transcript[:100] + "..." if len(transcript) > 100 else transcript,
-            "intensity": "medium",
-            "style": "comedic",
-            "notes": "Generated using fallback pattern",
-            "fallback": True
         },
         "timeline": timeline
     }
 
 
+# Lifted out of validate_keyframe_integrity so the per-call list
+# allocation disappears.
+_REQUIRED_KEYFRAME_FIELDS = ("startTime", "endTime", "animation", "expression", "intensity")
+
+
 def validate_keyframe_integrity(keyframe):
     """
     Quick validation that a keyframe has all required fields.
-    
+
     Args:
         keyframe (dict): Keyframe to validate
-        
+
     Returns:
         bool: True if valid
     """
-    required = ["startTime", "endTime", "animation", "expression", "intensity"]
-    return all(field in keyframe for field in required)
+    return all(field in keyframe for field in _REQUIRED_KEYFRAME_FIELDS)
 
 
 def clamp_intensity(value):
@@ -172,7 +182,7 @@ def sanitize_animation_script(script):
     """
     if not isinstance(script, dict):
         return None
-    
+
     # Ensure metadata exists
     metadata = script.get("metadata", {})
     
@@ -180,23 +190,24 @@ def sanitize_animation_script(script):
     timeline = script.get("timeline", [])
     if not isinstance(timeline, list):
         return None
-    
-    # Sanitize each keyframe
-    sanitized_timeline = []
-    for frame in timeline:
-        if not isinstance(frame, dict):
-            continue
-        
-        sanitized_frame = {
+
+    # Sanitize each keyframe. A comprehension avoids the per-iteration
+    # append attribute lookup, and the local _clamp binding skips a
+    # global lookup per frame.
+    _clamp = clamp_intensity
+    sanitized_timeline = [
+        {
             "startTime": frame.get("startTime", 0),
             "endTime": frame.get("endTime", 0),
             "animation": frame.get("animation", DEFAULT_ANIMATION),
             "expression": frame.get("expression", DEFAULT_EXPRESSION),
-            "intensity": clamp_intensity(frame.get("intensity", DEFAULT_INTENSITY)),
+            "intensity": _clamp(frame.get("intensity", DEFAULT_INTENSITY)),
             "notes": frame.get("notes", "")
         }
-        sanitized_timeline.append(sanitized_frame)
-    
+        for frame in timeline
+        if isinstance(frame, dict)
+    ]
+
     return {
         "metadata": metadata,
         "timeline": sanitized_timeline
@@ -4,10 +4,31 @@ Validates animation script structure and content against schema.
 """
 
 import logging
-from .animation_constants import AVAILABLE_ANIMATIONS, AVAILABLE_EXPRESSIONS, ANIMATION_CONFIG
+from .animation_constants import (
+    AVAILABLE_ANIMATIONS,
+    AVAILABLE_EXPRESSIONS,
+    ANIMATION_CONFIG,
+    DEFAULT_ANIMATION,
+    DEFAULT_EXPRESSION,
+    DEFAULT_INTENSITY,
+)
+from .animation_utils import clamp_intensity
 
 logger = logging.getLogger(__name__)
 
+# Lookup structures compiled once at import: keyframe validation runs up
+# to max_keyframes times per script, so per-call list construction and
+# full-dict membership probes add up.
+_ANIM_SET = frozenset(AVAILABLE_ANIMATIONS)
+_EXPR_SET = frozenset(AVAILABLE_EXPRESSIONS)
+_INTENSITY_SET = frozenset(("low", "medium", "high"))
+_REQUIRED_FIELDS = ("startTime", "endTime", "animation", "expression", "intensity")
+
+# Single numeric-type tuple reused everywhere: rebuilding the tuple and
+# re-resolving two globals inside each isinstance call adds up at up to
+# four checks per keyframe.
+_NUM = (int, float)
+
 
 def validate_animation_script(script, expected_duration):
     """
@@ -63,6 +84,93 @@ def validate_animation_script(script, expected_duration):
     return len(issues) == 0, issues
 
 
+def validate_and_sanitize(script, expected_duration):
+    """
+    Validate and sanitize an animation script in one timeline pass.
+
+    Fuses validate_animation_script and sanitize_animation_script: each
+    keyframe is checked, continuity-tracked and normalized in the same
+    iteration instead of being traversed twice with a second round of
+    dict allocations.
+
+    Args:
+        script (dict): The animation script to validate
+        expected_duration (float): Expected duration in seconds
+
+    Returns:
+        tuple: (sanitized: dict | None, issues: list[str]). The sanitized
+        script is None whenever any issue was found, matching the old
+        validate-then-fallback behavior.
+    """
+    issues = []
+
+    if not isinstance(script, dict):
+        return None, ["Script must be a dictionary"]
+
+    metadata = script.get("metadata")
+    if not metadata:
+        issues.append("Missing 'metadata' section")
+        metadata = {}
+    else:
+        issues.extend(_validate_metadata(metadata, expected_duration))
+
+    timeline = script.get("timeline", [])
+    if not timeline:
+        issues.append("Timeline is empty or missing")
+        return None, issues
+
+    if not isinstance(timeline, list):
+        issues.append("Timeline must be a list")
+        return None, issues
+
+    if len(timeline) > ANIMATION_CONFIG["max_keyframes"]:
+        issues.append(f"Timeline has too many keyframes ({len(timeline)} > {ANIMATION_CONFIG['max_keyframes']})")
+
+    if len(timeline) < 3:
+        issues.append("Timeline should have at least 3 keyframes")
+
+    sanitized_timeline = []
+    prev_end = None
+    for i, frame in enumerate(timeline):
+        frame_issues = _validate_keyframe(frame, i, expected_duration)
+        if frame_issues:
+            issues.extend(frame_issues)
+        if not isinstance(frame, dict):
+            continue
+
+        start_time = frame.get("startTime", 0)
+        end_time = frame.get("endTime", 0)
+
+        # Continuity checks folded into the same pass
+        if i == 0 and isinstance(start_time, _NUM) and start_time > 0.5:
+            issues.append("Timeline should start near 0 seconds")
+        if (
+            prev_end is not None
+            and isinstance(start_time, _NUM)
+            and isinstance(prev_end, _NUM)
+            and start_time - prev_end > 1
+        ):
+            issues.append(f"Gap in timeline between keyframe {i-1} and {i}")
+        prev_end = end_time
+
+        sanitized_timeline.append({
+            "startTime": start_time,
+            "endTime": end_time,
+            "animation": frame.get("animation", DEFAULT_ANIMATION),
+            "expression": frame.get("expression", DEFAULT_EXPRESSION),
+            "intensity": clamp_intensity(frame.get("intensity", DEFAULT_INTENSITY)),
+            "notes": frame.get("notes", "")
+        })
+
+    if isinstance(prev_end, _NUM) and prev_end < expected_duration - 1:
+        issues.append(f"Timeline ends at {prev_end}s but expected duration is {expected_duration}s")
+
+    if issues:
+        return None, issues
+
+    return {"metadata": metadata, "timeline": sanitized_timeline}, issues
+
+
 def _validate_metadata(metadata, expected_duration):
     """Validate metadata section."""
     issues = []
@@ -74,7 +182,7 @@ def _validate_metadata(metadata, expected_duration):
     duration = metadata.get("duration")
     if duration is None:
         issues.append("Metadata missing 'duration'")
-    elif not isinstance(duration, (int, float)):
+    elif not isinstance(duration, _NUM):
         issues.append(f"Metadata duration must be a number, got {type(duration)}")
     elif duration <= 0:
         issues.append(f"Metadata duration must be positive, got {duration}")
@@ -90,7 +198,7 @@ def _validate_metadata(metadata, expected_duration):
     
     # Check intensity
     intensity = metadata.get("intensity")
-    if intensity and intensity not in ["low", "medium", "high"]:
+    if intensity and intensity not in _INTENSITY_SET:
         issues.append(f"Metadata intensity must be 'low', 'medium', or 'high', got '{intensity}'")
     
     return issues
@@ -98,26 +206,30 @@ def _validate_metadata(metadata, expected_duration):
 
 def _validate_keyframe(frame, index, expected_duration):
     """Validate a single keyframe."""
-    issues = []
-    
+    # Cheapest check first so malformed frames short-circuit immediately
     if not isinstance(frame, dict):
         return [f"Keyframe {index} must be a dictionary"]
-    
+
+    issues = []
+    get = frame.get  # bound once; read for up to six keys below
+
     # Check required fields
-    required_fields = ["startTime", "endTime", "animation", "expression", "intensity"]
-    for field in required_fields:
+    for field in _REQUIRED_FIELDS:
         if field not in frame:
             issues.append(f"Keyframe {index} missing required field '{field}'")
-    
-    # Validate timing
-    start_time = frame.get("startTime")
-    end_time = frame.get("endTime")
-    
-    if start_time is not None and not isinstance(start_time, (int, float)):
+
+    # Validate timing. Non-numeric values are reported and then dropped
+    # so the range comparisons below can't blow up on a str.
+    start_time = get("startTime")
+    end_time = get("endTime")
+
+    if start_time is not None and not isinstance(start_time, _NUM):
         issues.append(f"Keyframe {index} startTime must be numeric")
-    if end_time is not None and not isinstance(end_time, (int, float)):
+        start_time = None
+    if end_time is not None and not isinstance(end_time, _NUM):
         issues.append(f"Keyframe {index} endTime must be numeric")
-    
+        end_time = None
+
     if start_time is not None and end_time is not None:
         if start_time < 0:
             issues.append(f"Keyframe {index} startTime cannot be negative")
@@ -125,53 +237,62 @@ def _validate_keyframe(frame, index, expected_duration):
             issues.append(f"Keyframe {index} endTime must be after startTime")
         if end_time > expected_duration + 1:  # 1 second tolerance
             issues.append(f"Keyframe {index} endTime exceeds duration")
-    
+
     # Validate animation
-    animation = frame.get("animation")
-    if animation and animation not in AVAILABLE_ANIMATIONS:
+    animation = get("animation")
+    if animation and animation not in _ANIM_SET:
         issues.append(f"Keyframe {index} has invalid animation '{animation}'")
-    
+
     # Validate expression
-    expression = frame.get("expression")
-    if expression and expression not in AVAILABLE_EXPRESSIONS:
+    expression = get("expression")
+    if expression and expression not in _EXPR_SET:
         issues.append(f"Keyframe {index} has invalid expression '{expression}'")
-    
+
     # Validate intensity
-    intensity = frame.get("intensity")
+    intensity = get("intensity")
     if intensity is not None:
-        if not isinstance(intensity, (int, float)):
+        if not isinstance(intensity, _NUM):
             issues.append(f"Keyframe {index} intensity must be numeric")
         elif not (0.0 <= intensity <= 1.0):
             issues.append(f"Keyframe {index} intensity must be between 0.0 and 1.0, got {intensity}")
-    
+
     return issues
 
 
 def _validate_timeline_continuity(timeline, expected_duration):
     """Validate that timeline covers the duration without gaps."""
     issues = []
-    
+
     if not timeline:
         return issues
-    
+
+    # Non-dict frames and non-numeric times are already reported by
+    # _validate_keyframe; skip them here rather than crash mid-check.
+    frames = [f for f in timeline if isinstance(f, dict)]
+    if not frames:
+        return issues
+
     # Check start time
-    first_frame = timeline[0]
-    if first_frame.get("startTime", 0) > 0.5:  # Allow small gap
+    first_start = frames[0].get("startTime", 0)
+    if isinstance(first_start, _NUM) and first_start > 0.5:  # Allow small gap
         issues.append("Timeline should start near 0 seconds")
-    
+
     # Check end time
-    last_frame = timeline[-1]
-    last_end = last_frame.get("endTime", 0)
-    if last_end < expected_duration - 1:  # 1 second tolerance
+    last_end = frames[-1].get("endTime", 0)
+    if isinstance(last_end, _NUM) and last_end < expected_duration - 1:  # 1 second tolerance
         issues.append(f"Timeline ends at {last_end}s but expected duration is {expected_duration}s")
-    
+
     # Check for significant gaps
-    for i in range(len(timeline) - 1):
-        current_end = timeline[i].get("endTime", 0)
-        next_start = timeline[i + 1].get("startTime", 0)
-        if next_start - current_end > 1:  # More than 1 second gap
+    for i in range(len(frames) - 1):
+        current_end = frames[i].get("endTime", 0)
+        next_start = frames[i + 1].get("startTime", 0)
+        if (
+            isinstance(current_end, _NUM)
+            and isinstance(next_start, _NUM)
+            and next_start - current_end > 1  # More than 1 second gap
+        ):
             issues.append(f"Gap in timeline between keyframe {i} and {i+1}")
-    
+
     return issues
 
 
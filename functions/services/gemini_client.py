@@ -0,0 +1,38 @@
+"""Shared Gemini client singleton.
+
+Every service talks to the same genai.Client so the SDK's connection
+pool is built once per process and reused; constructing a client per
+request would pay the TCP/TLS handshake on every call.
+"""
+
+import logging
+import threading
+
+import config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide Gemini client, creating it on first use.
+
+    The google.genai import is deferred to here so modules that import
+    this one don't pay the SDK's import cost until a request actually
+    needs the API.
+
+    Returns:
+        genai.Client: The shared client instance
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google import genai
+
+                _client = genai.Client(api_key=config.GEMINI_API_KEY)
+                logger.info("Created shared Gemini client")
+    return _client
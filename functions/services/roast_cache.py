@@ -0,0 +1,97 @@
+"""Perceptual response cache for roast generation.
+
+Second cache tier behind the exact byte-hash LRU in roast_service:
+re-encoded, re-compressed or slightly resized uploads of the same photo
+produce different bytes but nearly identical difference hashes, so a
+Hamming-distance match can reuse the earlier roast without another
+Gemini call.
+"""
+
+import logging
+import threading
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+# 8x8 difference hash = 64 bits; two photos within this Hamming distance
+# are treated as the same image.
+_HASH_SIZE = 8
+_MAX_DISTANCE = 6
+_MAX_ENTRIES = 256
+
+# (dhash, roast_data) pairs, oldest first. Linear scan is fine at this
+# size - Hamming lookups can't be bucketed like exact hashes anyway.
+_entries = []
+_lock = threading.Lock()
+
+
+def dhash(image_bytes):
+    """
+    Compute a 64-bit difference hash of an encoded image.
+
+    The image is decoded at thumbnail scale (JPEG draft cuts most of the
+    DCT work), converted to grayscale and reduced to a 9x8 grid; each bit
+    records whether a pixel is brighter than its right neighbor, which is
+    stable under re-encoding and mild resizing.
+
+    Args:
+        image_bytes: Encoded image data
+
+    Returns:
+        int or None: 64-bit hash, or None if the bytes can't be decoded
+    """
+    try:
+        from PIL import Image
+
+        image = Image.open(BytesIO(image_bytes))
+        image.draft("L", (_HASH_SIZE * 8, _HASH_SIZE * 8))
+        image = image.convert("L").resize(
+            (_HASH_SIZE + 1, _HASH_SIZE), Image.Resampling.BILINEAR
+        )
+        pixels = list(image.getdata())
+
+        value = 0
+        for row in range(_HASH_SIZE):
+            base = row * (_HASH_SIZE + 1)
+            for col in range(_HASH_SIZE):
+                value = (value << 1) | (pixels[base + col] > pixels[base + col + 1])
+        return value
+    except Exception as hash_error:
+        logger.warning(f"Perceptual hash failed: {hash_error}")
+        return None
+
+
+def lookup(image_hash):
+    """
+    Find a cached roast for a perceptually similar image.
+
+    Args:
+        image_hash: 64-bit dhash of the incoming image, or None
+
+    Returns:
+        dict or None: Cached roast data on a near-match
+    """
+    if image_hash is None:
+        return None
+    with _lock:
+        # Newest entries first: repeats usually follow closely.
+        for cached_hash, roast_data in reversed(_entries):
+            if bin(cached_hash ^ image_hash).count("1") <= _MAX_DISTANCE:
+                return roast_data
+    return None
+
+
+def store(image_hash, roast_data):
+    """
+    Remember a generated roast under the image's perceptual hash.
+
+    Args:
+        image_hash: 64-bit dhash of the image, or None to skip
+        roast_data: Normalized roast dict to cache
+    """
+    if image_hash is None:
+        return
+    with _lock:
+        _entries.append((image_hash, roast_data))
+        if len(_entries) > _MAX_ENTRIES:
+            del _entries[0]
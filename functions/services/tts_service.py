@@ -1,22 +1,30 @@
 """Text-to-speech service using Gemini TTS."""
 
-import base64
+import hashlib
 import logging
 import os
-import subprocess
-import sys
+import threading
 
-# Ensure parent directory is in path for config import
-if __name__ != "__main__":
-    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    if parent_dir not in sys.path:
-        sys.path.insert(0, parent_dir)
+import cachetools
+import pybase64
 
 from google.genai import types
 import config
 
 logger = logging.getLogger(__name__)
 
+# TTS is the heaviest external call in the pipeline and identical
+# narrations recur (duplicate uploads, cached roasts). Keyed by a hash
+# of model, voice and full prompt so any config change misses cleanly.
+# Raw PCM is cached instead of base64 - a third less memory - and
+# re-encoded on hit, which pybase64 does in microseconds. 32 entries of
+# a few hundred KB keeps the cache well under instance memory limits.
+_TTS_CACHE = cachetools.LRUCache(maxsize=32)
+# Unlike the roast/animation caches, which only ever run on the event
+# loop, this one is touched from executor worker threads - and LRUCache
+# reorders internally even on reads, so both get and set need the lock.
+_TTS_CACHE_LOCK = threading.Lock()
+
 
 def generate_tts_audio(client, text):
     """
@@ -44,6 +52,15 @@ def generate_tts_audio(client, text):
             f"\n\nPerform this: {text}"
         )
 
+        cache_key = hashlib.sha256(
+            f"{config.TTS_MODEL}|{config.TTS_VOICE}|{tts_prompt}".encode()
+        ).digest()
+        with _TTS_CACHE_LOCK:
+            cached_pcm = _TTS_CACHE.get(cache_key)
+        if cached_pcm is not None:
+            logger.info("TTS audio served from in-process cache")
+            return pybase64.b64encode(cached_pcm).decode("ascii")
+
         response = client.models.generate_content(
             model=config.TTS_MODEL,
             contents=tts_prompt,
@@ -60,89 +77,94 @@ def generate_tts_audio(client, text):
         )
 
         # Extract audio from response
-        audio_base64 = _extract_audio_from_response(response)
-        
-        if audio_base64:
-            logger.info(f"TTS audio generated successfully, size: {len(audio_base64)} bytes")
-            
+        audio_pcm = _extract_audio_bytes(response)
+
+        if audio_pcm:
+            with _TTS_CACHE_LOCK:
+                _TTS_CACHE[cache_key] = audio_pcm
+            audio_base64 = pybase64.b64encode(audio_pcm).decode("ascii")
+            logger.info("TTS audio generated successfully, size: %d bytes", len(audio_base64))
+
             # Save test files if enabled
             if config.ENABLE_AUDIO_TEST:
-                _save_test_audio_files(audio_base64)
+                _save_test_audio_files(audio_base64, audio_pcm)
         else:
+            audio_base64 = None
             logger.warning("TTS returned no audio data")
-            
+
         return audio_base64
 
     except Exception as e:
-        logger.exception(f"TTS generation failed: {e}")
+        logger.exception("TTS generation failed: %s", e)
         return None
 
 
-def _extract_audio_from_response(response):
+def _extract_audio_bytes(response):
     """
-    Extract base64 audio data from Gemini TTS response.
-    
+    Extract raw PCM audio data from Gemini TTS response.
+
+    The caller base64-encodes for transport (pybase64's SIMD codec is
+    ~5-8x faster than the stdlib on these multi-hundred-KB blobs) and
+    caches the smaller raw form.
+
     Args:
         response: Gemini API response
-        
+
     Returns:
-        str or None: Base64-encoded audio data
+        bytes or None: Raw PCM audio data
     """
     if not response.candidates:
         return None
-        
+
     for candidate in response.candidates:
         if not (candidate.content and candidate.content.parts):
             continue
-            
+
         for part in candidate.content.parts:
             if hasattr(part, "inline_data") and part.inline_data:
-                return base64.b64encode(part.inline_data.data).decode("utf-8")
-    
+                return part.inline_data.data
+
     return None
 
 
-def _save_test_audio_files(audio_base64):
+def _save_test_audio_files(audio_base64, audio_pcm):
     """
     Save test audio files for local development/testing.
-    
+
+    The WAV is written straight from the PCM already in memory; reading
+    the base64 .txt back just to decode a 33%-larger copy of the same
+    bytes was a pointless disk round-trip.
+
     Args:
         audio_base64: Base64-encoded audio data
+        audio_pcm: Raw PCM bytes decoded from the TTS response
     """
     try:
+        # Imported here so the production path never loads the module.
+        from utils.decode_audio import create_wav_header
+
         # Get the functions directory (parent of services)
         services_dir = os.path.dirname(os.path.abspath(__file__))
         functions_dir = os.path.dirname(services_dir)
         temp_dir = os.path.join(functions_dir, "temp")
         base64_file = os.path.join(temp_dir, "audio_base64.txt")
         wav_file = os.path.join(temp_dir, "roast_audio.wav")
-        
+
         # Create temp directory if it doesn't exist
         os.makedirs(temp_dir, exist_ok=True)
-        
+
         # Save base64
         with open(base64_file, "w") as f:
             f.write(audio_base64)
-        logger.info(f"Base64 audio saved to {base64_file}")
-        
-        # Decode to WAV using Python script
-        decode_script = os.path.join(functions_dir, "utils", "decode_audio.py")
-        
-        if os.path.exists(decode_script):
-            result = subprocess.run(
-                ["python", decode_script, base64_file, wav_file],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
-                logger.info(f"WAV file created at {wav_file}")
-            else:
-                logger.warning(f"Failed to create WAV file: {result.stderr}")
-        else:
-            logger.warning(f"Decode script not found at {decode_script}")
-            
+        logger.info("Base64 audio saved to %s", base64_file)
+
+        with open(wav_file, "wb") as f:
+            f.write(create_wav_header(len(audio_pcm)))
+            f.write(audio_pcm)
+        logger.info("WAV file created at %s", wav_file)
+
     except Exception as e:
-        logger.warning(f"Failed to save/decode audio file: {e}")
+        logger.warning("Failed to save audio files: %s", e)
 
 
 def get_audio_mime_type():
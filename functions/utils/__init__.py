@@ -1 +1,13 @@
 """Utilities package for helper functions."""
+
+import os
+import sys
+
+# config lives next to this package. The entrypoint (main.py) imports it
+# first, so this is a single dict lookup on normal cold starts, and the
+# filesystem-touching path math runs once per process here instead of
+# once per module that needs config.
+if "config" not in sys.modules:
+    _parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _parent_dir not in sys.path:
+        sys.path.insert(0, _parent_dir)
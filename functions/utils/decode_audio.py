@@ -1,23 +1,41 @@
 """
 Script to decode base64 audio to WAV file with proper headers
 """
-import base64
 import sys
 import os
 import struct
 
+import pybase64
+
+
+# Full 44-byte header as one struct, with the default 24kHz mono 16-bit
+# layout packed once at import. Only the two size fields vary per call,
+# so the common case is two 4-byte patches instead of three pack calls
+# and two concatenations.
+_WAV_STRUCT = struct.Struct('<4sI4s4sIHHIIHH4sI')
+_WAV_TEMPLATE = _WAV_STRUCT.pack(
+    b'RIFF', 0, b'WAVE',
+    b'fmt ', 16, 1, 1, 24000, 48000, 2, 16,
+    b'data', 0,
+)
+
 
 def create_wav_header(data_size, sample_rate=24000, num_channels=1, bits_per_sample=16):
     """Create a WAV file header for PCM audio."""
+    if (sample_rate, num_channels, bits_per_sample) == (24000, 1, 16):
+        header = bytearray(_WAV_TEMPLATE)
+        struct.pack_into('<I', header, 4, 36 + data_size)
+        struct.pack_into('<I', header, 40, data_size)
+        return bytes(header)
+
     byte_rate = sample_rate * num_channels * bits_per_sample // 8
     block_align = num_channels * bits_per_sample // 8
-    
-    header = struct.pack('<4sI4s', b'RIFF', 36 + data_size, b'WAVE')
-    header += struct.pack('<4sIHHIIHH', b'fmt ', 16, 1, num_channels, sample_rate, 
-                          byte_rate, block_align, bits_per_sample)
-    header += struct.pack('<4sI', b'data', data_size)
-    
-    return header
+    return _WAV_STRUCT.pack(
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, num_channels, sample_rate,
+        byte_rate, block_align, bits_per_sample,
+        b'data', data_size,
+    )
 
 
 def decode_audio(base64_file="audio_base64.txt", output_file="roast_audio.wav"):
@@ -36,7 +54,7 @@ def decode_audio(base64_file="audio_base64.txt", output_file="roast_audio.wav"):
     # Decode base64 to bytes
     print("Decoding base64 to audio bytes...")
     try:
-        pcm_data = base64.b64decode(base64_audio)
+        pcm_data = pybase64.b64decode(base64_audio, validate=False)
     except Exception as e:
         print(f"Error: Failed to decode base64 data! {e}")
         return False
@@ -46,15 +64,16 @@ def decode_audio(base64_file="audio_base64.txt", output_file="roast_audio.wav"):
     # Add WAV header to PCM data
     print("Adding WAV header to PCM data...")
     wav_header = create_wav_header(len(pcm_data))
-    wav_data = wav_header + pcm_data
-    
-    # Save as WAV file
+
+    # Save as WAV file. Two writes instead of header + pcm_data: the
+    # concatenation copied every PCM byte just to feed a single write.
     print(f"Saving audio to {output_file}...")
     with open(output_file, "wb") as f:
-        f.write(wav_data)
-    
+        f.write(wav_header)
+        f.write(pcm_data)
+
     print(f"Success! Audio saved to {output_file}")
-    print(f"Total file size: {len(wav_data)} bytes (header + PCM data)")
+    print(f"Total file size: {len(wav_header) + len(pcm_data)} bytes (header + PCM data)")
     return True
 
 
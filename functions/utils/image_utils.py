@@ -1,73 +1,265 @@
 """Image processing utilities."""
 
-import base64
 from io import BytesIO
-from PIL import Image
+
+import pybase64
+from PIL import Image, ImageFile
 import logging
 
+import config
+
+# Tolerate partially-uploaded images instead of raising mid-decode, and
+# bound the decompressed pixel count so a tiny upload can't expand into
+# a decompression bomb. PIL only raises at 2x this cap (warns at 1x), so
+# 67MP keeps full-resolution 48-50MP phone photos working while still
+# refusing anything past ~134MP.
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+Image.MAX_IMAGE_PIXELS = 8192 * 8192
+
 logger = logging.getLogger(__name__)
 
 
+# SOF markers that carry frame dimensions (excludes DHT/JPG/DAC which
+# share the 0xC0 range but describe tables, not frames).
+_JPEG_SOF_MARKERS = frozenset(
+    (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+)
+
+
+def _jpeg_dimensions(data):
+    """
+    Read (width, height) from a JPEG's SOF marker without decoding pixels.
+
+    Args:
+        data: Raw JPEG bytes (starting with the SOI marker)
+
+    Returns:
+        tuple or None: (width, height), or None if no SOF marker found
+    """
+    i = 2  # skip SOI
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if 0xD0 <= marker <= 0xD9:  # RSTn/SOI/EOI: standalone, no length
+            i += 2
+            continue
+        length = (data[i + 2] << 8) | data[i + 3]
+        if marker in _JPEG_SOF_MARKERS:
+            height = (data[i + 5] << 8) | data[i + 6]
+            width = (data[i + 7] << 8) | data[i + 8]
+            return (width, height)
+        i += 2 + length
+    return None
+
+
 def parse_image_from_request(request):
     """
     Parse image from Flask request (either base64 JSON or multipart upload).
-    
+
+    Most real uploads are phone photos that are already JPEG and within
+    the dimension cap; for those the raw bytes are returned untouched so
+    the caller can skip the PIL decode/resize/re-encode cycle entirely.
+
     Args:
         request: Flask request object
-        
+
     Returns:
-        PIL.Image or None if no image found
+        bytes if the upload is a JPEG already within MAX_IMAGE_DIMENSION,
+        PIL.Image otherwise, or None if no image found
+
+    Raises:
+        ValueError: If the payload exceeds the upload size cap or the
+            image is too large to decode safely
     """
-    image = None
+    raw_bytes = None
     request_json = request.get_json(silent=True)
 
     # Try base64 JSON format
     if request_json and "image" in request_json:
         logger.info("Image received as base64")
         image_base64 = request_json["image"]
-        if "," in image_base64:
-            image_base64 = image_base64.split(",")[1]
-        image_bytes = base64.b64decode(image_base64)
-        image = Image.open(BytesIO(image_bytes))
+        # Preflight cap: reject oversized payloads before spending any
+        # CPU on base64 decode or PIL work. Raised rather than returned
+        # as None so the client sees "too large", not "no image".
+        if len(image_base64) > config.MAX_IMAGE_B64_LENGTH:
+            logger.warning("Rejected base64 image of %d chars (cap %d)",
+                           len(image_base64), config.MAX_IMAGE_B64_LENGTH)
+            raise ValueError("Image payload too large")
+        # Strip an optional data-URI prefix without split()'s list +
+        # full-copy allocation on a potentially multi-MB string.
+        comma = image_base64.find(",")
+        if comma >= 0:
+            image_base64 = image_base64[comma + 1:]
+        raw_bytes = pybase64.b64decode(image_base64, validate=False)
 
     # Try multipart upload
     elif "image" in request.files:
         logger.info("Image received as multipart upload")
-        image = Image.open(request.files["image"].stream)
+        # content_length covers the whole multipart body; checking it
+        # before read() keeps an oversized upload out of memory.
+        if request.content_length and request.content_length > config.MAX_IMAGE_B64_LENGTH:
+            logger.warning("Rejected multipart upload of %d bytes (cap %d)",
+                           request.content_length, config.MAX_IMAGE_B64_LENGTH)
+            raise ValueError("Image payload too large")
+        raw_bytes = request.files["image"].read()
+
+    if not raw_bytes:
+        return None
+
+    try:
+        return _image_from_bytes(raw_bytes)
+    except Image.DecompressionBombError as bomb_error:
+        # Surface as the validation error the handler maps to a 400
+        # instead of letting PIL's subclass escape to a 500.
+        logger.warning("Rejected decompression bomb: %s", bomb_error)
+        raise ValueError("Image is too large to decode safely") from bomb_error
+
+
+def parse_images_from_request(request):
+    """
+    Parse a batch of images from a JSON request body.
+
+    Expects a list of base64 strings under "images". Kept separate from
+    parse_image_from_request so the single-image path stays allocation
+    free when no batch is involved.
+
+    Args:
+        request: Flask request object
+
+    Returns:
+        list of (bytes or PIL.Image) entries, or None if the request
+        carries no "images" list
+    """
+    request_json = request.get_json(silent=True)
+    if not request_json or not isinstance(request_json.get("images"), list):
+        return None
+
+    logger.info("Batch of %d images received as base64", len(request_json["images"]))
+    images = []
+    for image_base64 in request_json["images"]:
+        if len(image_base64) > config.MAX_IMAGE_B64_LENGTH:
+            logger.warning("Skipping oversized batch image of %d chars", len(image_base64))
+            continue
+        comma = image_base64.find(",")
+        if comma >= 0:
+            image_base64 = image_base64[comma + 1:]
+        raw_bytes = pybase64.b64decode(image_base64, validate=False)
+        if raw_bytes:
+            try:
+                images.append(_image_from_bytes(raw_bytes))
+            except Image.DecompressionBombError as bomb_error:
+                logger.warning("Skipping batch decompression bomb: %s", bomb_error)
+    return images
+
+
+def _png_dimensions(data):
+    """
+    Read (width, height) from a PNG's IHDR chunk without decoding pixels.
+
+    IHDR is mandatory and always first, so the dimensions sit at fixed
+    offsets right after the 8-byte signature and chunk header.
+
+    Args:
+        data: Raw PNG bytes (starting with the PNG signature)
+
+    Returns:
+        tuple or None: (width, height), or None if the header is short
+    """
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    width = int.from_bytes(data[16:20], "big")
+    height = int.from_bytes(data[20:24], "big")
+    return (width, height)
+
+
+def _image_from_bytes(raw_bytes):
+    """
+    Turn raw upload bytes into something the roast pipeline can send.
+
+    Args:
+        raw_bytes: Decoded image bytes
+
+    Returns:
+        bytes unchanged for an in-cap JPEG or PNG, otherwise a PIL.Image
+    """
+    # Fast path: a JPEG or PNG already within the cap goes straight to
+    # Gemini (the service sniffs the MIME type from the magic bytes).
+    if raw_bytes[:3] == b"\xff\xd8\xff":
+        dimensions = _jpeg_dimensions(raw_bytes)
+        if dimensions and max(dimensions) <= config.MAX_IMAGE_DIMENSION:
+            logger.info("JPEG %s within cap, forwarding raw bytes", dimensions)
+            return raw_bytes
+    elif raw_bytes[:8] == b"\x89PNG\r\n\x1a\n":
+        dimensions = _png_dimensions(raw_bytes)
+        if dimensions and max(dimensions) <= config.MAX_IMAGE_DIMENSION:
+            logger.info("PNG %s within cap, forwarding raw bytes", dimensions)
+            return raw_bytes
+
+    image = Image.open(BytesIO(raw_bytes))
+
+    if image.format == "JPEG":
+        # libjpeg can decode directly at 1/2, 1/4 or 1/8 scale; for inputs
+        # well above the cap this skips most of the DCT work before the
+        # real resize even starts.
+        image.draft("RGB", (config.MAX_IMAGE_DIMENSION, config.MAX_IMAGE_DIMENSION))
 
     return image
 
 
-def resize_image(image, max_dimension=1024):
+def resize_image(image, max_dimension=config.MAX_IMAGE_DIMENSION):
     """
     Resize image to maximum dimension while maintaining aspect ratio.
-    
+
     Args:
         image: PIL.Image object
         max_dimension: Maximum width or height
-        
+
     Returns:
         PIL.Image resized image
     """
     if image.width > max_dimension or image.height > max_dimension:
-        ratio = min(max_dimension / image.width, max_dimension / image.height)
-        new_size = (int(image.width * ratio), int(image.height * ratio))
-        logger.info(f"Resizing image from {image.size} to {new_size}")
-        return image.resize(new_size, Image.Resampling.LANCZOS)
+        original_size = image.size
+        # thumbnail() does the ratio math in C and resizes in place, so
+        # there's no second full-resolution allocation. reducing_gap=2.0
+        # enables the two-pass box+bilinear reducer, ~3x faster than
+        # LANCZOS at large downscales with no visible difference at
+        # vision-model resolution.
+        image.thumbnail(
+            (max_dimension, max_dimension),
+            Image.Resampling.BILINEAR,
+            reducing_gap=2.0,
+        )
+        logger.info("Resized image from %s to %s", original_size, image.size)
     return image
 
 
-def image_to_bytes(image, format="PNG"):
+def image_to_bytes(image, format="JPEG", quality=config.JPEG_QUALITY, buffer=None):
     """
     Convert PIL Image to bytes.
-    
+
+    JPEG is the default: for photographs it is several times smaller than
+    PNG at visually equivalent quality, which means fewer upload bytes and
+    fewer image tokens per Gemini call.
+
     Args:
         image: PIL.Image object
-        format: Image format (e.g., "PNG", "JPEG")
-        
+        format: Image format (e.g., "JPEG", "PNG")
+        quality: JPEG quality (ignored for lossless formats)
+        buffer: Optional BytesIO to encode into. Callers that pool a
+            buffer across requests avoid a multi-MB allocation per call;
+            the buffer is rewound and truncated before use.
+
     Returns:
         bytes: Image data
     """
-    buffer = BytesIO()
-    image.save(buffer, format=format)
+    if format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if buffer is None:
+        buffer = BytesIO()
+    else:
+        buffer.seek(0)
+        buffer.truncate(0)
+    image.save(buffer, format=format, quality=quality, optimize=False, progressive=False)
     return buffer.getvalue()